@@ -11,8 +11,8 @@ Usage:
 """
 
 import argparse
-from src.cli.app import run_cli
-from src.web.run import run_streamlit_app
+import runpy
+import sys
 from dotenv import load_dotenv
 from src.utils.logging import configure_logging
 
@@ -28,6 +28,19 @@ def main():
     Entry point for the application.
     Allows selecting between CLI and web interface.
     """
+    # Under `streamlit run main.py` argv belongs to streamlit, so don't let
+    # argparse touch it; render the web UI inside this script run instead
+    # of launching (or exec'ing) a second server. The sys.modules guard
+    # keeps the CLI path from importing streamlit just for the check.
+    if "streamlit" in sys.modules:
+        from streamlit import runtime
+
+        if runtime.exists():
+            # runpy re-executes the app source on every Streamlit rerun; a
+            # plain import would render once and then be module-cached.
+            runpy.run_module("src.web.app", run_name="__main__")
+            return
+
     parser = argparse.ArgumentParser(description="Google Analytics - Business Intelligence - Agent")
     parser.add_argument(
         "--ui",
@@ -35,13 +48,24 @@ def main():
         default="web",
         help="Select user interface: cli or web",
     )
-    
+    parser.add_argument(
+        "--batch-file",
+        default=None,
+        help="File with one question per line, processed concurrently (CLI only)",
+    )
+
     args = parser.parse_args()
-    
+
+    # Import the selected interface only after parsing, so the CLI path does
+    # not pay for streamlit and friends (and vice versa).
     if args.ui == "web":
+        from src.web.run import run_streamlit_app
+
         run_streamlit_app()
     else:
-        run_cli()
+        from src.cli.app import run_cli
+
+        run_cli(batch_file=args.batch_file)
 
 
 if __name__ == "__main__":
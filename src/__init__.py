@@ -6,7 +6,18 @@ allowing users to ask questions about Google Analytics data and receive
 insightful answers powered by Gemini and LangGraph.
 """
 
-from src.core.graph import run_analytics_query
-from src.cli.app import run_cli
-
 __all__ = ["run_analytics_query", "run_cli"]
+
+
+def __getattr__(name):
+    # Re-export the public entry points lazily so importing the package does
+    # not pull in LangGraph, streamlit and the BigQuery SDK up front.
+    if name == "run_analytics_query":
+        from src.core.graph import run_analytics_query
+
+        return run_analytics_query
+    if name == "run_cli":
+        from src.cli.app import run_cli
+
+        return run_cli
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,15 +2,33 @@
 Command-line interface for the Google Analytics - Business Intelligence - Agent.
 """
 
-from src.core.graph import run_analytics_query
+from src.core.graph import run_analytics_query, run_analytics_queries
 
 
-def run_cli():
+def run_cli(batch_file=None):
     """
     Run the CLI interface for the Google Analytics - Business Intelligence - Agent.
+
+    Args:
+        batch_file: Optional path to a file with one question per line; when
+            given, all questions are processed concurrently and the CLI exits.
     """
     print("BigQuery Google Analytics Agent")
     print("===============================")
+
+    if batch_file:
+        with open(batch_file) as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+        print(f"\nProcessing {len(questions)} questions from {batch_file}...")
+        results = run_analytics_queries(questions)
+
+        for question, result in zip(questions, results):
+            print(f"\n----- {question} -----\n")
+            print(result)
+            print("\n-------------------\n")
+        return
+
     print("Ask a question about Google Analytics data:")
 
     while True:
@@ -2,10 +2,8 @@
 Configuration settings for the Google Analytics - Business Intelligence - Agent.
 """
 
-from dotenv import load_dotenv
 import os
-
-load_dotenv()
+import re
 
 # BigQuery dataset configuration
 DATASET_NAME = "bigquery-public-data.google_analytics_sample"
@@ -13,9 +11,22 @@ DATASET_NAME = "bigquery-public-data.google_analytics_sample"
 # Query result limits
 MAX_RESULTS_DISPLAY = 20
 
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable is not set.")
+# Refuse queries whose dry run estimates more than this many scanned bytes;
+# protects against LLM-generated unbounded scans of the sample dataset.
+MAX_BYTES_SCANNED = 10 * 1024**3
+
+
+def get_api_key():
+    """
+    Return the Gemini API key from the environment.
+
+    Read lazily (after main.py has loaded .env) so importing the package
+    does not require credentials to be present.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is not set.")
+    return api_key
 
 # SQL safety settings
 FORBIDDEN_SQL_KEYWORDS = [
@@ -35,6 +46,12 @@ FORBIDDEN_SQL_KEYWORDS = [
     "transaction",
 ]
 
+# Precompiled word-boundary alternation over the forbidden keywords, so
+# validation is a single case-insensitive scan instead of one search per keyword.
+FORBIDDEN_SQL_RE = re.compile(
+    r"\b(?:" + "|".join(FORBIDDEN_SQL_KEYWORDS) + r")\b", re.IGNORECASE
+)
+
 # Memory configuration
 MEMORY_CHECKPOINT_NAME = "analytics-agent-memory"
 
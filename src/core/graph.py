@@ -2,36 +2,137 @@
 LangGraph workflow definition for the Google Analytics - Business Intelligence - Agent.
 """
 
+import asyncio
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
 from langgraph.graph import END, START, StateGraph
 from langgraph.checkpoint.memory import MemorySaver
-from typing import Dict, Any, AsyncIterator, TypedDict, List, Union, Optional, Callable
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+
+try:
+    # Optional extra: install langgraph-checkpoint-sqlite for persistent,
+    # non-blocking checkpoints; streaming falls back to MemorySaver without it.
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+except ImportError:
+    AsyncSqliteSaver = None
+from typing import Dict, Any, AsyncIterator, TypedDict, List, Optional, Callable
+from langchain_core.messages import BaseMessage
 import logging
 
 from src.core.agents import (
     AnalysisState,
+    match_greeting,
+    prepare_context_node,
     sql_generator_node,
     sql_executor_node,
-    results_explainer_node,
-    visualization_generator_node,
     conversation_router_node,
     sql_reflection_node,
+    results_explainer_node,
+    visualization_generator_node,
 )
 
-memory = MemorySaver()
+class _BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer that evicts the least recently written threads.
+
+    MemorySaver keeps every checkpoint for every thread_id forever; with
+    content-addressed thread ids that is one entry per distinct question, so
+    a long-running server grows without bound. Whole threads are tracked in
+    an LRU and the oldest is dropped once the limit is exceeded.
+    """
+
+    def __init__(self, max_threads: int = 1024):
+        super().__init__()
+        self._max_threads = max_threads
+        self._thread_lru: "OrderedDict[str, None]" = OrderedDict()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        self._thread_lru[thread_id] = None
+        self._thread_lru.move_to_end(thread_id)
+        while len(self._thread_lru) > self._max_threads:
+            evicted, _ = self._thread_lru.popitem(last=False)
+            self.storage.pop(evicted, None)
+            stale_writes = [key for key in self.writes if key[0] == evicted]
+            for key in stale_writes:
+                del self.writes[key]
+            # The channel values themselves (messages, query results, viz
+            # configs - the bulk of a checkpoint) live in blobs keyed by
+            # (thread_id, ns, channel, version); dropping only storage and
+            # writes would leave them accumulating forever.
+            stale_blobs = [key for key in self.blobs if key[0] == evicted]
+            for key in stale_blobs:
+                del self.blobs[key]
+        return result
+
+
+memory = _BoundedMemorySaver()
 
 logger = logging.getLogger("gabi.core.graph")
 
+# Case-insensitive tag scan for the router's exit path; avoids lowercasing a
+# copy of the whole response just to locate the tag.
+_ANALYTICS_FALSE_RE = re.compile(r"analytics_query:\s*false", re.IGNORECASE)
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+# Static conditional-edge routing maps, shared by every graph build.
+_ROUTER_MAP = {
+    "sql_generator": "sql_generator",
+    END: END,
+}
+_REFLECTION_MAP = {
+    "sql_generator": "sql_generator",
+    "visualization_generator": "visualization_generator",
+    "results_explainer": "results_explainer",
+}
+
 
 def create_analytics_graph():
     """
-    Create and return the LangGraph workflow for BigQuery analytics.
+    Return the compiled LangGraph workflow for BigQuery analytics.
+
+    The compiled graph is stateless apart from the shared checkpointer, so it
+    is built once under a lock and reused by every entry point; concurrent
+    first calls cannot compile it twice.
 
     Returns:
         A compiled LangGraph workflow
     """
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = _build_analytics_graph()
+    return _graph
+
+
+def _build_analytics_graph(checkpointer=memory):
+    """Compile the shared workflow definition against the given checkpointer."""
+    graph = _analytics_workflow().compile(checkpointer=checkpointer)
+    logger.info("Analytics graph compiled successfully")
+    return graph
+
+
+@lru_cache(maxsize=1)
+def _analytics_workflow():
+    """
+    Assemble the analytics StateGraph, once per process.
+
+    The node and edge definition is checkpointer-independent, so callers
+    that need their own checkpointer (the per-query sqlite saver, whose
+    connection is bound to one event loop) pay only the compile step on
+    this shared definition instead of rebuilding the whole graph.
+    """
     workflow = StateGraph(AnalysisState)
 
+    workflow.add_node("prepare_context", prepare_context_node)
     workflow.add_node("conversation_router", conversation_router_node)
     workflow.add_node("sql_generator", sql_generator_node)
     workflow.add_node("sql_executor", sql_executor_node)
@@ -39,7 +140,14 @@ def create_analytics_graph():
     workflow.add_node("visualization_generator", visualization_generator_node)
     workflow.add_node("results_explainer", results_explainer_node)
 
-    workflow.add_edge(START, "conversation_router")
+    def join_results(state: AnalysisState):
+        """Fan-in barrier after the parallel post-SQL branches; reducers have merged state."""
+        return {}
+
+    workflow.add_node("join_results", join_results)
+
+    workflow.add_edge(START, "prepare_context")
+    workflow.add_edge("prepare_context", "conversation_router")
     
     def route_query(state: AnalysisState) -> str:
         """Determine where to route the query based on whether it requires analytics."""
@@ -49,60 +157,137 @@ def create_analytics_graph():
             router_messages = state.get("messages", [])
             if router_messages and hasattr(router_messages[-1], 'content'):
                 content = router_messages[-1].content
-                tag_index = content.lower().find("analytics_query: false")
-                if tag_index > 0:
-                    general_response = content[:tag_index].strip()
+                tag_match = _ANALYTICS_FALSE_RE.search(content)
+                if tag_match and tag_match.start() > 0:
+                    general_response = content[:tag_match.start()].strip()
                 else:
                     general_response = content.strip()
                 
                 state["general_response"] = general_response
-                logger.info(f"General response extracted: {general_response[:50]}...")
+                logger.info("General response extracted: %.50s...", general_response)
         
-        logger.info(f"Routing query, requires_analytics: {requires_analytics}")
+        logger.info("Routing query, requires_analytics: %s", requires_analytics)
         return "sql_generator" if requires_analytics else END
         
     workflow.add_conditional_edges(
         "conversation_router",
         route_query,
-        {
-            "sql_generator": "sql_generator",
-            END: END,
-        }
+        _ROUTER_MAP,
     )
     
     workflow.add_edge("sql_generator", "sql_executor")
     workflow.add_edge("sql_executor", "sql_reflection")
     
-    def route_sql_results(state: AnalysisState) -> str:
-        """Determine whether to proceed with results or retry SQL generation."""
+    def route_sql_results(state: AnalysisState):
+        """Determine whether to fan out to results processing or retry SQL generation."""
         reflection_result = state.get("reflection_result", "PASS")
-        
-        logger.info(f"SQL Reflection decision: {reflection_result}")
-        
+
+        logger.info("SQL Reflection decision: %s", reflection_result)
+
         if reflection_result == "RETRY":
             feedback = state.get("sql_feedback", "Results were not satisfactory")
-            logger.info(f"SQL feedback for retry: {feedback[:100]}...")
+            logger.info("SQL feedback for retry: %.100s...", feedback)
             return "sql_generator"
         else:
             logger.info("SQL reflection passed, proceeding with results processing")
-            return "visualization_generator"
-    
+            # Both successors run concurrently as siblings of the same
+            # super-step; the join node fans them back in.
+            return ["visualization_generator", "results_explainer"]
+
     workflow.add_conditional_edges(
         "sql_reflection",
         route_sql_results,
+        _REFLECTION_MAP,
+    )
+
+    workflow.add_edge("visualization_generator", "join_results")
+    workflow.add_edge("results_explainer", "join_results")
+    workflow.add_edge("join_results", END)
+
+    return workflow
+
+
+def _normalize_history(chat_history: Optional[List[Dict[str, str]]]) -> List[Dict[str, Any]]:
+    """
+    Normalize chat history entries so both keys are always present.
+
+    Guaranteeing the Exchange schema at ingest lets the nodes use direct
+    subscripts instead of per-iteration .get calls with defaults.
+    """
+    return [
         {
-            "sql_generator": "sql_generator",
-            "visualization_generator": "visualization_generator",
+            "question": exchange.get("question", ""),
+            "response": exchange.get("response") or {},
         }
+        for exchange in (chat_history or [])
+    ]
+
+
+def _history_fingerprint(normalized_history: List[Dict[str, Any]]) -> tuple:
+    """
+    Reduce a normalized history to a flat, hashable tuple of strings.
+
+    Only the prior questions and their explanations influence the run (they
+    are what the nodes format into the conversation context), so the
+    fingerprint ignores the rest of each response payload.
+    """
+    return tuple(
+        part
+        for exchange in normalized_history
+        for part in (
+            exchange["question"],
+            str(exchange["response"].get("explanation", "")),
+        )
     )
-    
-    workflow.add_edge("visualization_generator", "results_explainer")
-    workflow.add_edge("results_explainer", END)
 
-    graph = workflow.compile(checkpointer=memory)
-    logger.info("Analytics graph compiled successfully")
 
-    return graph
+def _thread_id(prefix: str, question: str, history_parts: tuple = ()) -> str:
+    """
+    Derive a stable, content-addressed thread id for the checkpointer.
+
+    Python's built-in hash() is randomized per process, so identical
+    questions would land on different threads across runs and never reuse
+    their checkpoints; blake2b gives a stable, well-distributed digest.
+    Folding the history fingerprint in keeps the same question on distinct
+    threads when its surrounding conversation differs.
+    """
+    hasher = hashlib.blake2b(question.encode("utf-8"), digest_size=6)
+    for part in history_parts:
+        hasher.update(b"\x00")
+        hasher.update(part.encode("utf-8"))
+    return prefix + hasher.hexdigest()
+
+
+def _thread_config(prefix: str, question: str, history_parts: tuple = ()) -> Dict[str, Any]:
+    """
+    Build the checkpointer config for one run.
+
+    Centralizes the configurable shape so every entry point carries the same
+    stable thread id and checkpoint namespace for tracing.
+    """
+    return {
+        "configurable": {
+            "thread_id": _thread_id(prefix, question, history_parts),
+            "checkpoint_ns": "analytics",
+        }
+    }
+
+
+# Shared defaults for a fresh run; entry points spread this and override the
+# per-call fields. Never mutate the template (or its containers) in place.
+_INITIAL_STATE_TEMPLATE: AnalysisState = {
+    "question": "",
+    "messages": [],
+    "conversation_context": "",
+    "sql_query": "",
+    "query_results": {},
+    "visualization_config": {},
+    "chat_history": [],
+    "requires_analytics": False,
+    "general_response": "",
+    "sql_feedback": None,
+    "reflection_result": None,
+}
 
 
 def run_analytics_query(question: str, chat_history: Optional[List[Dict[str, str]]] = None) -> str:
@@ -116,35 +301,45 @@ def run_analytics_query(question: str, chat_history: Optional[List[Dict[str, str
     Returns:
         The final analysis and insights
     """
-    thread_id = "analytics-" + str(hash(question))[:8]
-    thread_config = {"configurable": {"thread_id": thread_id}}
+    greeting = match_greeting(question)
+    if greeting is not None:
+        logger.info("Trivial input answered without invoking the graph")
+        return greeting
 
-    logger.info(f"Creating analytics graph for query: '{question[:50]}...'")
-    graph = create_analytics_graph()
+    normalized_history = _normalize_history(chat_history)
+    thread_config = _thread_config(
+        "analytics-", question, _history_fingerprint(normalized_history)
+    )
 
-    logger.debug(f"Graph structure: {graph.get_graph().draw_mermaid()}")
+    logger.info("Creating analytics graph for query: '%.50s...'", question)
+    graph = create_analytics_graph()
 
     initial_state = {
+        **_INITIAL_STATE_TEMPLATE,
         "question": question,
-        "messages": [],
-        "sql_query": "",
-        "query_results": {},
-        "visualization_config": {},
-        "chat_history": chat_history or [],
-        "requires_analytics": False,
-        "general_response": "",
-        "sql_feedback": None,
-        "reflection_result": None
+        "chat_history": normalized_history,
     }
 
     logger.info("Executing analytics graph workflow")
-    result = graph.invoke(initial_state, thread_config)
+    result = asyncio.run(graph.ainvoke(initial_state, thread_config))
     logger.info("Analytics graph workflow completed")
 
+    return _extract_answer(result)
+
+
+def _extract_answer(result: Dict[str, Any]) -> str:
+    """Pull the final user-facing answer out of a completed graph state."""
     if not result.get("requires_analytics", False):
         logger.info("Query was handled as general conversation")
         return result.get("general_response", "I'm not sure how to respond to that.")
-        
+
+    # Prefer the dedicated explanation channel: with the parallel post-SQL
+    # branches, the order of the trailing messages is not deterministic.
+    explanation = result.get("explanation")
+    if explanation:
+        logger.info("Analytics query completed successfully with results")
+        return explanation
+
     final_messages = result["messages"]
     if final_messages:
         logger.info("Analytics query completed successfully with results")
@@ -154,8 +349,41 @@ def run_analytics_query(question: str, chat_history: Optional[List[Dict[str, str
         return "No results were generated."
 
 
+def run_analytics_queries(questions: List[str]) -> List[str]:
+    """
+    Run several independent questions through the analytics pipeline concurrently.
+
+    Each question gets its own state and thread, and all graph invocations are
+    gathered on one event loop so the LLM round-trips overlap instead of
+    running back to back.
+
+    Args:
+        questions: The users' natural language questions about Google Analytics data
+
+    Returns:
+        The final analysis for each question, in input order
+    """
+    graph = create_analytics_graph()
+
+    async def _run_all() -> List[Dict[str, Any]]:
+        tasks = []
+        for question in questions:
+            thread_config = _thread_config("analytics-batch-", question)
+            initial_state = {**_INITIAL_STATE_TEMPLATE, "question": question}
+            tasks.append(graph.ainvoke(initial_state, thread_config))
+        return await asyncio.gather(*tasks)
+
+    logger.info("Executing analytics graph workflow for %d questions", len(questions))
+    results = asyncio.run(_run_all())
+    return [_extract_answer(result) for result in results]
+
+
 class StreamEvent(TypedDict):
-    """Event type for streaming analytics updates."""
+    """Event type for streaming analytics updates.
+
+    "update" events carry a node's state delta in data; "token" events carry
+    an incremental LLM text chunk, with the raw chunk in message.
+    """
     type: str
     data: Any
     node: Optional[str]
@@ -178,42 +406,88 @@ async def stream_analytics_query(
     Yields:
         Streaming updates from the analytics pipeline
     """
-    thread_id = "analytics-stream-" + str(hash(question))[:8]
-    thread_config = {"configurable": {"thread_id": thread_id}}
+    greeting = match_greeting(question)
+    if greeting is not None:
+        logger.info("Trivial input answered without invoking the graph")
+        # Mirror the shape of a router update so downstream handlers need no
+        # special casing for the short-circuit path.
+        event_data = {
+            "type": "update",
+            "data": {
+                "conversation_router": {
+                    "requires_analytics": False,
+                    "general_response": greeting,
+                }
+            },
+            "node": "conversation_router",
+        }
+        if stream_handler:
+            stream_handler(event_data)
+        yield event_data
+        return
 
-    logger.info(f"Creating streaming analytics graph for query: '{question[:50]}...'")
-    graph = create_analytics_graph()
+    normalized_history = _normalize_history(chat_history)
+    thread_config = _thread_config(
+        "analytics-stream-", question, _history_fingerprint(normalized_history)
+    )
 
-    logger.debug(f"Graph structure: {graph.get_graph().draw_mermaid()}")
+    logger.info("Creating streaming analytics graph for query: '%.50s...'", question)
+    graph = create_analytics_graph()
 
     initial_state = {
+        **_INITIAL_STATE_TEMPLATE,
         "question": question,
-        "messages": [],
-        "sql_query": "",
-        "query_results": {},
-        "visualization_config": {},
-        "chat_history": chat_history or [],
-        "requires_analytics": False,
-        "general_response": "",
-        "sql_feedback": None,
-        "reflection_result": None
+        "chat_history": normalized_history,
     }
 
     logger.info("Beginning streaming analytics workflow execution")
     event_count = 0
-    async for event in graph.astream(initial_state, thread_config, stream_mode="updates"):
-        event_count += 1
-        event_data = {
-            "type": "update",
-            "data": event,
-            "node": list(event.keys())[0] if event else None,
-        }
 
-        if stream_handler:
-            node_name = event_data.get("node", "unknown")
-            logger.debug(f"Streaming event from {node_name} node")
-            stream_handler(event_data)
-        
-        yield event_data
-    
-    logger.info(f"Streaming workflow completed with {event_count} events processed")
+    async def _run(active_graph) -> AsyncIterator[Dict[str, Any]]:
+        async for mode, event in active_graph.astream(
+            initial_state, thread_config, stream_mode=["updates", "messages"]
+        ):
+            if mode == "messages":
+                # Token-level chunks surfaced by the model callbacks; the
+                # node name rides in the event metadata.
+                chunk, metadata = event
+                content = getattr(chunk, "content", "")
+                if not content:
+                    continue
+                event_data = {
+                    "type": "token",
+                    "data": content,
+                    "node": metadata.get("langgraph_node"),
+                    "message": chunk,
+                }
+            else:
+                event_data = {
+                    "type": "update",
+                    "data": event,
+                    "node": next(iter(event), None),
+                }
+
+            if stream_handler:
+                node_name = event_data.get("node", "unknown")
+                logger.debug("Streaming event from %s node", node_name)
+                stream_handler(event_data)
+
+            yield event_data
+
+    if AsyncSqliteSaver is None:
+        async for event_data in _run(graph):
+            event_count += 1
+            yield event_data
+    else:
+        # Checkpoint writes go through aiosqlite, which never blocks the
+        # event loop mid-stream, and the checkpoints survive restarts. The
+        # connection is bound to the current event loop, so the saver is
+        # scoped per call instead of cached across asyncio.run invocations;
+        # only the compile against this saver is paid per query, the
+        # workflow definition itself is shared.
+        async with AsyncSqliteSaver.from_conn_string("checkpoints.db") as checkpointer:
+            async for event_data in _run(_build_analytics_graph(checkpointer)):
+                event_count += 1
+                yield event_data
+
+    logger.info("Streaming workflow completed with %d events processed", event_count)
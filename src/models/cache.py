@@ -0,0 +1,92 @@
+"""
+SQLite-backed LLM response cache.
+
+A minimal stand-in for langchain_community's SQLiteCache built on the
+langchain_core cache interface and the stdlib sqlite3 module, so the
+persistent cache does not pull in the whole langchain-community package.
+"""
+import sqlite3
+from typing import Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    prompt TEXT NOT NULL,
+    llm TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    response TEXT NOT NULL,
+    PRIMARY KEY (prompt, llm, idx)
+)
+"""
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache LLM generations in a local SQLite database.
+
+    Each (prompt, llm_string) pair maps to the serialized list of
+    generations it produced; entries survive process restarts. A fresh
+    connection is opened per operation — cheap next to the network round
+    trip being avoided, and safe when LangChain calls the sync methods
+    from executor threads.
+    """
+
+    def __init__(self, database_path: str = ".langchain.db"):
+        """
+        Initialize the cache and create its table if needed.
+
+        Args:
+            database_path: Path of the SQLite database file
+        """
+        self.database_path = database_path
+        with sqlite3.connect(self.database_path) as connection:
+            connection.execute(_SCHEMA)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """
+        Look up cached generations for a prompt/model pair.
+
+        Args:
+            prompt: The rendered prompt string
+            llm_string: The model's configuration fingerprint
+
+        Returns:
+            The cached list of generations, or None on a miss
+        """
+        with sqlite3.connect(self.database_path) as connection:
+            rows = connection.execute(
+                "SELECT response FROM llm_cache WHERE prompt = ? AND llm = ? ORDER BY idx",
+                (prompt, llm_string),
+            ).fetchall()
+        if not rows:
+            return None
+        return [loads(row[0]) for row in rows]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """
+        Store generations for a prompt/model pair, replacing any previous entry.
+
+        Args:
+            prompt: The rendered prompt string
+            llm_string: The model's configuration fingerprint
+            return_val: The list of generations to cache
+        """
+        with sqlite3.connect(self.database_path) as connection:
+            connection.execute(
+                "DELETE FROM llm_cache WHERE prompt = ? AND llm = ?",
+                (prompt, llm_string),
+            )
+            connection.executemany(
+                "INSERT INTO llm_cache (prompt, llm, idx, response) VALUES (?, ?, ?, ?)",
+                [
+                    (prompt, llm_string, idx, dumps(generation))
+                    for idx, generation in enumerate(return_val)
+                ],
+            )
+
+    def clear(self, **kwargs) -> None:
+        """Drop every cached entry."""
+        with sqlite3.connect(self.database_path) as connection:
+            connection.execute("DELETE FROM llm_cache")
@@ -3,15 +3,29 @@ Model configuration for Google Vertex AI.
 """
 
 import logging
+from functools import lru_cache
+from langchain_core.globals import set_llm_cache
+from src.models.cache import SQLiteCache
 from langchain_google_genai import ChatGoogleGenerativeAI
-from src.config import API_KEY
+from src.config import get_api_key
 
 logger = logging.getLogger("gabi.models")
 
+# Cache LLM responses by prompt so repeated identical requests (dashboard
+# refreshes, re-asked example questions) skip the network round-trip. The
+# SQLite backing also survives restarts.
+set_llm_cache(SQLiteCache(database_path="llm_cache.db"))
+
+
+@lru_cache(maxsize=8)
 def get_model(temperature=0, model_name="gemini-2.0-flash"):
     """
     Get a configured instance of the ChatGoogleGenerativeAI model.
 
+    Instances are memoized per (temperature, model_name) so repeated calls
+    share one client — and with it the pooled HTTP connections — instead of
+    redoing credential resolution and client setup per request.
+
     Args:
         temperature: The sampling temperature (0.0 to 1.0)
         model_name: The name of the Vertex AI model to use
@@ -20,5 +34,5 @@ def get_model(temperature=0, model_name="gemini-2.0-flash"):
         An initialized ChatGoogleGenerativeAI instance
     """
     return ChatGoogleGenerativeAI(
-        model=model_name, temperature=temperature, api_key=API_KEY
+        model=model_name, temperature=temperature, api_key=get_api_key()
     )
@@ -1,7 +1,13 @@
 import json
+import sys
+from typing import Final
+
 from src.config import DATASET_NAME, EXAMPLE_QUERIES
 
-CONVERSATION_ROUTER_PROMPT = f"""You are an intelligent assistant for a BigQuery Analytics application.
+# Prompts are computed once at import and frozen; the interpolated ones are
+# interned so module reloads (common under Streamlit) reuse the same string
+# object and downstream prefix caches see byte-identical content.
+CONVERSATION_ROUTER_PROMPT: Final[str] = sys.intern(f"""You are an intelligent assistant for a BigQuery Analytics application.
 
 Your job is to:
 1. Determine whether a user question requires SQL analytics on Google Analytics data
@@ -37,9 +43,9 @@ If you're handling a non-analytics query:
 6. You can also suggest example queries, here are some of example queries, you can think of more as required: {json.dumps(EXAMPLE_QUERIES)}
 
 Your goal is to be conversational for general queries while directing analytics questions to the data pipeline.
-"""
+""")
 
-SQL_REFLECTION_PROMPT = """You are an SQL execution quality controller. Your job is to:
+SQL_REFLECTION_PROMPT: Final[str] = """You are an SQL execution quality controller. Your job is to:
 
 1. Review the SQL query that was executed 
 2. Analyze the execution results
@@ -67,7 +73,20 @@ Your response MUST start with either "DECISION: PASS" or "DECISION: RETRY" follo
 If the decision is RETRY, provide specific feedback about what was wrong with the original SQL or results and how it could be improved.
 """
 
-SQL_EXECUTOR_PROMPT = """You are a BigQuery execution specialist. Your job is to:
+# Two-phase variant of the reflection prompt: the decision is a single word
+# (cheap to decode on the common PASS path), and the free-form feedback is
+# only requested when a retry is actually needed.
+SQL_REFLECTION_DECISION_PROMPT: Final[str] = sys.intern(SQL_REFLECTION_PROMPT.split(
+    "Your response MUST start with"
+)[0] + """Respond with exactly one word: PASS or RETRY. Do not include any explanation.
+""")
+
+SQL_REFLECTION_FEEDBACK_PROMPT: Final[str] = """You are an SQL execution quality controller. The SQL query below was executed, but its results did not satisfactorily answer the original question.
+
+Provide specific feedback about what was wrong with the SQL or the results and how the query should be improved. Respond with the feedback only.
+"""
+
+SQL_EXECUTOR_PROMPT: Final[str] = """You are a BigQuery execution specialist. Your job is to:
 1. Take SQL queries, and check if they are valid BigQuery SQL queries, formatted correctly
 2. Execute them using the BigQuery client tool
 3. Return the raw results
@@ -79,7 +98,7 @@ Use your execute_bigquery_sql tool to run the SQL query and get results.
 """
 
 
-VISUALIZATION_PROMPT = """You are a data visualization expert specializing in creating charts for business analytics data.
+VISUALIZATION_PROMPT: Final[str] = """You are a data visualization expert specializing in creating charts for business analytics data.
 Your task is to analyze query results and generate a visualization configuration that best represents the data.
 
 1. Analyze the structure and content of the provided query results
@@ -123,7 +142,7 @@ Your response should contain ONLY the JSON configuration, nothing else.
 """
 
 
-RESULTS_EXPLAINER_PROMPT = """You are a Google Analytics insights specialist. Your job is to:
+RESULTS_EXPLAINER_PROMPT: Final[str] = """You are a Google Analytics insights specialist. Your job is to:
 1. Review SQL query results from BigQuery Google Analytics data
 2. Explain the results in clear, business-friendly language
 3. Identify 3-5 key patterns, trends, or anomalies in the data
@@ -149,7 +168,12 @@ Make sure to respond in the language the original query was asked in.
 Balance technical accuracy with business relevance, focusing on insights that drive decisions.
 """
 
-SQL_GENERATOR_PROMPT = f"""You are a Google Analytics BigQuery SQL expert. Your job is to:
+# The SQL generator prompt is assembled from three ordered blocks so the
+# large literal pieces (instructions, schema) stay byte-identical across
+# config changes and the only interpolated part (the dataset name) rides at
+# the very end. Provider prefix caches key on leading bytes, so touching the
+# dataset no longer invalidates the whole schema prefix.
+SQL_GEN_INSTRUCTIONS: Final[str] = """You are a Google Analytics BigQuery SQL expert. Your job is to:
 1. Convert business questions into precise, efficient BigQuery SQL queries
 2. Optimize queries for the Google Analytics schema structure
 3. Consider performance by using appropriate filtering and joins
@@ -157,7 +181,7 @@ SQL_GENERATOR_PROMPT = f"""You are a Google Analytics BigQuery SQL expert. Your
 5. Add LIMIT clauses for safety and performance, but don't use them for aggregations that require full data
 6. Use % for wildcard searches in WHERE clauses, when applicable
 7. Make sure that the SQL query is safe, and would execute without any linting errors
-8. Focus exclusively on the Google Analytics sample dataset: {DATASET_NAME}
+8. Focus exclusively on the Google Analytics sample dataset named at the end of this prompt
 
 Important considerations for Google Analytics BigQuery queries:
 - Use UNNEST() for working with nested/repeated fields like hits[], customDimensions[]
@@ -168,8 +192,9 @@ Important considerations for Google Analytics BigQuery queries:
 - DO NOT use any other dataset, table names, or available columns outside of the Google Analytics dataset
 
 Only return the SQL query without additional text or explanations.
+"""
 
-Available columns in the Google Analytics dataset:
+SQL_GEN_SCHEMA: Final[str] = """Available columns in the Google Analytics dataset:
 
 ### SESSION LEVEL DATA ###
 # Primary Identifiers
@@ -510,50 +535,13 @@ hits.sourcePropertyInfo.sourcePropertyTrackingId
 
 # Publisher Infos (Detailed)
 hits.publisher_infos
-hits.publisher_infos.dfpClicks
-hits.publisher_infos.dfpImpressions
-hits.publisher_infos.dfpMatchedQueries
-hits.publisher_infos.dfpMeasurableImpressions
-hits.publisher_infos.dfpQueries
-hits.publisher_infos.dfpRevenueCpm
-hits.publisher_infos.dfpRevenueCpc
-hits.publisher_infos.dfpViewableImpressions
-hits.publisher_infos.dfpPagesViewed
-hits.publisher_infos.adsenseBackfillDfpClicks
-hits.publisher_infos.adsenseBackfillDfpImpressions
-hits.publisher_infos.adsenseBackfillDfpMatchedQueries
-hits.publisher_infos.adsenseBackfillDfpMeasurableImpressions
-hits.publisher_infos.adsenseBackfillDfpQueries
-hits.publisher_infos.adsenseBackfillDfpRevenueCpm
-hits.publisher_infos.adsenseBackfillDfpRevenueCpc
-hits.publisher_infos.adsenseBackfillDfpViewableImpressions
-hits.publisher_infos.adsenseBackfillDfpPagesViewed
-hits.publisher_infos.adxBackfillDfpClicks
-hits.publisher_infos.adxBackfillDfpImpressions
-hits.publisher_infos.adxBackfillDfpMatchedQueries
-hits.publisher_infos.adxBackfillDfpMeasurableImpressions
-hits.publisher_infos.adxBackfillDfpQueries
-hits.publisher_infos.adxBackfillDfpRevenueCpm
-hits.publisher_infos.adxBackfillDfpRevenueCpc
-hits.publisher_infos.adxBackfillDfpViewableImpressions
-hits.publisher_infos.adxBackfillDfpPagesViewed
-hits.publisher_infos.adxClicks
-hits.publisher_infos.adxImpressions
-hits.publisher_infos.adxMatchedQueries
-hits.publisher_infos.adxMeasurableImpressions
-hits.publisher_infos.adxQueries
-hits.publisher_infos.adxRevenue
-hits.publisher_infos.adxViewableImpressions
-hits.publisher_infos.adxPagesViewed
-hits.publisher_infos.adsViewed
-hits.publisher_infos.adsUnitsViewed
-hits.publisher_infos.adsUnitsMatched
-hits.publisher_infos.viewableAdsViewed
-hits.publisher_infos.measurableAdsViewed
-hits.publisher_infos.adsPagesViewed
-hits.publisher_infos.adsClicked
-hits.publisher_infos.adsRevenue
-hits.publisher_infos.dfpAdGroup
-hits.publisher_infos.dfpAdUnits
-hits.publisher_infos.dfpNetworkId
-"""
\ No newline at end of file
+# hits.publisher_infos has exactly the same subfields as hits.publisher
+# above: every hits.publisher.<field> column is also available as
+# hits.publisher_infos.<field>
+"""
+
+SQL_GEN_DATASET_TAIL: Final[str] = f"Dataset: {DATASET_NAME}\n"
+
+SQL_GENERATOR_PROMPT: Final[str] = sys.intern(
+    SQL_GEN_INSTRUCTIONS + "\n" + SQL_GEN_SCHEMA + "\n" + SQL_GEN_DATASET_TAIL
+)
\ No newline at end of file
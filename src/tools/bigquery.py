@@ -2,52 +2,109 @@
 Tools for executing BigQuery operations.
 """
 
-from typing import Dict, Any
-import re
+from typing import Dict, Any, Tuple
+from collections import OrderedDict
+from functools import lru_cache
 import logging
+import os
+import re
+import time
 from langchain_core.tools import tool
-from google.cloud import bigquery
 import streamlit as st
-from google.oauth2 import service_account
 
-from src.config import MAX_RESULTS_DISPLAY, FORBIDDEN_SQL_KEYWORDS
+from src.config import MAX_BYTES_SCANNED, MAX_RESULTS_DISPLAY, FORBIDDEN_SQL_RE
 
 from dotenv import load_dotenv
 
 # Configure logger using the hierarchical naming convention
 logger = logging.getLogger("gabi.tools")
 
-load_dotenv()
+# Skip the filesystem .env probe when credentials are already in the
+# environment (the common case once main.py has loaded it).
+if not os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
+    load_dotenv()
+
+# Successful query results are cached for a few minutes keyed on normalized
+# SQL: the agents frequently regenerate byte-identical (or whitespace-variant)
+# queries across turns, and GA sample data is static, so exact repeats can
+# skip the 1-5s BigQuery round trip entirely. The short TTL keeps results
+# feeling consistent within a conversation without growing stale forever.
+_SQL_WS_RE = re.compile(r"\s+")
+# Quoted sections of a statement: string literals (single or double quoted,
+# with escapes) and backtick-quoted identifiers. BigQuery compares both
+# case-sensitively, so normalization must leave them untouched.
+_SQL_QUOTED_RE = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+_RESULT_CACHE: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_RESULT_CACHE_MAXSIZE = 128
+_RESULT_CACHE_TTL = 300.0
+
+
+def _result_cache_key(sql: str) -> str:
+    """
+    Normalize SQL for cache lookup without changing its meaning.
+
+    Whitespace is collapsed and keywords lowercased only outside quoted
+    regions; string literals and backtick identifiers are case-sensitive in
+    BigQuery, so 'India' and 'INDIA' must produce distinct keys.
+    """
+    parts = _SQL_QUOTED_RE.split(sql)
+    # re.split with one capturing group alternates unquoted/quoted parts,
+    # quoted ones at the odd indices.
+    normalized = "".join(
+        part if i % 2 else _SQL_WS_RE.sub(" ", part).lower()
+        for i, part in enumerate(parts)
+    )
+    return normalized.strip().rstrip(";")
 
 
+@lru_cache(maxsize=1)
 def check_streamlit():
     """
     Function to check whether python code is run within streamlit
 
+    The answer cannot change within a process, so it is computed once.
+    runtime.exists() is process-wide and thread-safe, which matters here:
+    tool calls run on executor threads, where the script-run context the
+    old probe relied on is absent and would misreport a Streamlit server
+    as plain Python.
+
     Returns
     -------
     use_streamlit : boolean
         True if code is run within streamlit, else False
     """
     try:
-        from streamlit.runtime.scriptrunner.script_runner import get_script_run_ctx
+        from streamlit import runtime
 
-        if not get_script_run_ctx():
-            use_streamlit = False
-        else:
-            use_streamlit = True
+        return runtime.exists()
     except ModuleNotFoundError:
-        use_streamlit = False
-    return use_streamlit
+        return False
 
 
-if check_streamlit():
-    credentials = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"]
-    )
-    bigquery_client = bigquery.Client(credentials=credentials)
-else:
-    bigquery_client = bigquery.Client()
+@st.cache_resource(show_spinner=False)
+def get_bigquery_client():
+    """
+    Return the shared BigQuery client for this process.
+
+    st.cache_resource keeps one client (and its parsed credentials and TLS
+    session) alive across Streamlit reruns instead of re-authenticating on
+    each script execution; outside Streamlit the decorator still memoizes
+    in-process.
+
+    Returns:
+        A configured bigquery.Client instance
+    """
+    # Deferred: the google-cloud stack is a heavyweight import chain that
+    # only the first actual query execution should pay for.
+    from google.cloud import bigquery
+    from google.oauth2 import service_account
+
+    if check_streamlit():
+        credentials = service_account.Credentials.from_service_account_info(
+            st.secrets["gcp_service_account"]
+        )
+        return bigquery.Client(credentials=credentials)
+    return bigquery.Client()
 
 
 @tool
@@ -63,41 +120,71 @@ def execute_bigquery_sql(sql: str) -> Dict[str, Any]:
         total row count (if successful), or error message (if failed)
     """
     try:
-        # Add a safety check to prevent accidental data modification
-        sql_lower = sql.lower().strip()
-
-        # Simple check for any forbidden SQL keywords
-        found_forbidden = False
-        found_keyword = None
-
-        for keyword in FORBIDDEN_SQL_KEYWORDS:
-            pattern = r"\b{}\b".format(keyword)
-            if re.search(pattern, sql_lower):
-                found_forbidden = True
-                found_keyword = keyword
-                break
-
-        if found_forbidden:
+        # Safety check to prevent accidental data modification: a single
+        # case-insensitive scan with the precompiled keyword alternation.
+        forbidden_match = FORBIDDEN_SQL_RE.search(sql)
+        if forbidden_match:
             return {
                 "success": False,
-                "error": f"Forbidden SQL operation detected: {found_keyword}",
+                "error": f"Forbidden SQL operation detected: {forbidden_match.group(0).lower()}",
             }
 
-        query_job = bigquery_client.query(sql)
-        results = query_job.result()
+        cache_key = _result_cache_key(sql)
+        cached = _RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            stored_at, output = cached
+            if time.monotonic() - stored_at < _RESULT_CACHE_TTL:
+                _RESULT_CACHE.move_to_end(cache_key)
+                logger.info("Returning cached BigQuery results for repeated query")
+                return output
+            del _RESULT_CACHE[cache_key]
+
+        from google.cloud import bigquery
+
+        client = get_bigquery_client()
+
+        # Free dry run first: invalid SQL fails in ~100ms with a proper
+        # error instead of after a full billed execution, and the scan
+        # estimate lets us refuse runaway queries before spending budget.
+        dry_run_job = client.query(
+            sql, job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        )
+        bytes_estimate = dry_run_job.total_bytes_processed or 0
+        if bytes_estimate > MAX_BYTES_SCANNED:
+            return {
+                "success": False,
+                "error": (
+                    f"Query would scan {bytes_estimate} bytes, above the "
+                    f"{MAX_BYTES_SCANNED} byte safety limit. Narrow the date "
+                    "range or selected columns."
+                ),
+            }
 
-        # Convert results to a list of dictionaries for easier handling
-        results_list = []
-        for row in results:
-            row_dict = {key: value for key, value in row.items()}
-            results_list.append(row_dict)
+        # query_and_wait issues a single synchronous RPC instead of the
+        # insert-job-then-poll pair, and the max_results cap stops the
+        # client from pulling result pages past the display limit;
+        # total_rows still reports the full size of the result set.
+        results = client.query_and_wait(
+            sql,
+            job_config=bigquery.QueryJobConfig(use_query_cache=True),
+            max_results=MAX_RESULTS_DISPLAY,
+        )
+
+        # Convert results to a list of dictionaries for easier handling;
+        # dict(row) maps the Row through its schema in C instead of a
+        # per-column Python-level comprehension.
+        results_list = [dict(row) for row in results]
 
         output = {
             "success": True,
-            "results": results_list[:MAX_RESULTS_DISPLAY],
+            "results": results_list,
             "total_rows": results.total_rows,
         }
 
+        _RESULT_CACHE[cache_key] = (time.monotonic(), output)
+        if len(_RESULT_CACHE) > _RESULT_CACHE_MAXSIZE:
+            _RESULT_CACHE.popitem(last=False)
+
         return output
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -4,14 +4,18 @@ Import this module at the start of the application to set up logging.
 """
 import logging
 import sys
-import os
-import inspect
 
 def configure_logging():
     """
     Configure logging for all modules in the application.
     This function should be called at the beginning of the application.
     """
+    # The format string never uses thread or process fields, so skip
+    # collecting them (a get_ident/getpid call each) on every record.
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
     # Check if logging is already configured
     if not logging.getLogger().handlers:
         # Set up root logger with console handler
@@ -37,18 +41,4 @@ def configure_logging():
         # Set specific levels for our application loggers
         for logger_name, level in loggers.items():
             logger = logging.getLogger(logger_name)
-            logger.setLevel(level)
-
-# Helper function to get the current file and function name
-def get_logger_context():
-    """
-    Get context information for logging (file, function, line).
-    
-    Returns:
-        str: Formatted context string with file and function name
-    """
-    frame = inspect.currentframe().f_back.f_back  # Go up two frames to get the caller
-    filename = os.path.basename(frame.f_code.co_filename)
-    function = frame.f_code.co_name
-    lineno = frame.f_lineno
-    return f"[{filename}:{function}:{lineno}]"
\ No newline at end of file
+            logger.setLevel(level)
\ No newline at end of file
@@ -3,12 +3,8 @@ Streamlit-based chat interface for the Google Analytics - Business Intelligence
 """
 import asyncio
 import streamlit as st
-import sys
-import os
 import logging
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-
 from src.web.state import initialize_session_state
 from src.web.components.sidebar import render_sidebar
 from src.web.components.chat import display_chat_history
@@ -2,11 +2,34 @@
 Chat interface components for the Google Analytics - Business Intelligence - Agent.
 """
 import streamlit as st
+import pyarrow as pa
 import logging
 from src.web.components.visualization import render_visualization
 
 logger = logging.getLogger("gabi.web.components")
 
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def viz_table(viz_data):
+    """
+    Build (and memoize) the display table for a viz_data payload.
+
+    st.dataframe converts whatever it is given to Arrow before shipping it
+    to the browser; building the pyarrow.Table directly skips the pandas
+    round trip entirely, and the cache means each distinct payload is
+    converted once rather than on every rerun of every historical message.
+
+    Args:
+        viz_data: Columnar {column: [values]} dict (or legacy list of row
+            dictionaries) from the visualization config
+
+    Returns:
+        A pyarrow.Table over the data
+    """
+    if isinstance(viz_data, dict):
+        return pa.Table.from_pydict(viz_data)
+    return pa.Table.from_pylist(viz_data)
+
 def create_chat_message_placeholders():
     """
     Create empty placeholders for the chat response components.
@@ -30,33 +53,80 @@ def display_chat_history():
     """
     logger.debug(f"Rendering chat history with {len(st.session_state.chat_history)} messages")
     
-    for i, chat in enumerate(st.session_state.chat_history):
+    history = st.session_state.chat_history
+    cutoff = len(history) - FULL_RENDER_WINDOW
+    for i, chat in enumerate(history):
         with st.chat_message("user"):
             st.markdown(chat["question"])
-        
+
         with st.chat_message("assistant"):
-            response = chat["response"]
-            
-            if response.get("sql_query"):
-                with st.expander("SQL Query", expanded=False):
-                    st.markdown(response["sql_query"])
-            
-            if response.get("viz_data"):
-                with st.expander("Data Table", expanded=False):
-                    try:
-                        import pandas as pd
-                        df = pd.DataFrame(response["viz_data"])
-                        st.dataframe(df, use_container_width=True)
-                    except Exception as e:
-                        logger.error(f"Error displaying data table in history: {str(e)}")
-                        st.error(f"Error displaying data: {str(e)}")
-            
-            if response.get("viz_config") and response.get("viz_data"):
-                render_visualization(
-                    response["viz_config"],
-                    response["viz_data"]
-                )
-            
-            if response.get("explanation"):
-                st.markdown("### Analysis")
-                st.markdown(response["explanation"])
\ No newline at end of file
+            if i < cutoff:
+                _render_condensed(chat["response"])
+            else:
+                render_response(chat["response"])
+
+
+# Only the most recent messages get the full treatment (Arrow table and
+# Plotly chart); older ones collapse to their prose. Streamlit re-executes
+# the whole script on each rerun, so skipping old messages entirely would
+# blank them — rendering them cheaply is the available work-avoidance.
+FULL_RENDER_WINDOW = 10
+
+
+def _render_condensed(response):
+    """
+    Render an old assistant response cheaply: SQL and analysis text only.
+
+    Args:
+        response: The response dictionary stored in chat history
+    """
+    if response.get("sql_query"):
+        with st.expander("SQL Query", expanded=False):
+            st.markdown(response["sql_query"])
+
+    if response.get("viz_data"):
+        st.caption("Table and chart omitted for older messages.")
+
+    if response.get("explanation"):
+        st.markdown(
+            response.get("explanation_md")
+            or "### Analysis\n\n" + response["explanation"]
+        )
+
+
+def render_response(response):
+    """
+    Render one completed assistant response (SQL, table, chart, analysis).
+
+    Shared by the history loop and the live-response fragment so a finished
+    answer looks identical whichever path drew it.
+
+    Args:
+        response: The response dictionary stored in chat history
+    """
+    if response.get("sql_query"):
+        with st.expander("SQL Query", expanded=False):
+            st.markdown(response["sql_query"])
+
+    if response.get("viz_data"):
+        with st.expander("Data Table", expanded=False):
+            try:
+                st.dataframe(viz_table(response["viz_data"]), use_container_width=True)
+            except Exception as e:
+                logger.error(f"Error displaying data table in history: {str(e)}")
+                st.error(f"Error displaying data: {str(e)}")
+
+    if response.get("viz_config") and response.get("viz_data"):
+        render_visualization(
+            response["viz_config"],
+            response["viz_data"]
+        )
+
+    # The pre-joined form is built once when the turn is appended to
+    # history; the fallback covers the live fragment's snapshot, which
+    # has no cached blob.
+    if response.get("explanation"):
+        st.markdown(
+            response.get("explanation_md")
+            or "### Analysis\n\n" + response["explanation"]
+        )
\ No newline at end of file
@@ -7,6 +7,34 @@ from src.config import EXAMPLE_QUERIES
 
 logger = logging.getLogger("gabi.web.components")
 
+# EXAMPLE_QUERIES is static at module load, so the (category, query, widget
+# key) layout is computed once instead of being rebuilt on every rerun.
+_SIDEBAR_CATEGORIES = [
+    (category, [(query, f"{category}_{i}") for i, query in enumerate(queries)])
+    for category, queries in EXAMPLE_QUERIES.items()
+]
+
+
+@st.fragment
+def _render_example_queries():
+    """
+    Render the example-query buttons inside a fragment.
+
+    A button click reruns only this subtree; the selection is published via
+    session state and an app-scoped rerun so the main script picks up the
+    query, instead of every sidebar interaction re-executing the whole page
+    by default.
+    """
+    for category, items in _SIDEBAR_CATEGORIES:
+        with st.expander(category):
+            for query, key in items:
+                if st.button(query, key=key):
+                    st.session_state.query = query
+                    st.session_state.example_selected = True
+                    logger.info(f"Example query selected: '{query}'")
+                    st.rerun(scope="app")
+
+
 def render_sidebar():
     """
     Render the sidebar with app information and categorized example queries.
@@ -21,17 +49,10 @@ def render_sidebar():
     st.sidebar.markdown("### Example Queries")
     st.sidebar.write("Click on any example to use it:")
     
-    example_selected = False
-    
-    query_categories = EXAMPLE_QUERIES
-    
-    for category, queries in query_categories.items():
-        with st.sidebar.expander(category):
-            for i, query in enumerate(queries):
-                if st.button(query, key=f"{category}_{i}"):
-                    st.session_state.query = query
-                    example_selected = True
-                    logger.info(f"Example query selected: '{query}'")
+    with st.sidebar:
+        _render_example_queries()
+
+    example_selected = st.session_state.pop("example_selected", False)
 
     st.sidebar.markdown("---")
     st.sidebar.markdown("Made by [the Cynikal inc.](https://github.com/criticic) during the [HOLON](https://www.holonai.ai/) x [Königsberger Bridges Institute](https://kb.institute/) [AI AGENTS HACKATHON 2025](https://hackathon.holonai.ai/)")
@@ -1,7 +1,9 @@
 """
 Visualization components for the Google Analytics - Business Intelligence - Agent.
 """
+import json
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -9,130 +11,194 @@ import logging
 
 logger = logging.getLogger("gabi.web.components")
 
+
+@st.cache_data(show_spinner=False)
+def _table_schema(columns_key):
+    """
+    Resolve (and memoize) header labels and data keys for a table config.
+
+    The column spec is immutable for a given message, so the header/key
+    extraction is computed once per distinct spec rather than on each build.
+
+    Args:
+        columns_key: Tuple of (header, data_key) pairs from config["columns"]
+
+    Returns:
+        A (headers, data_keys) pair of lists
+    """
+    headers = [header or data_key for header, data_key in columns_key]
+    data_keys = [data_key for _, data_key in columns_key]
+    return headers, data_keys
+
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def _build_figure(cache_key, _config, _data):
+    """
+    Build (and memoize) the Plotly figure for a config/data pair.
+
+    Figures are rebuilt for every historical message on every rerun;
+    caching on a precomputed key string collapses that to one build per
+    distinct chart. The underscore-prefixed arguments are excluded from
+    Streamlit's hashing, so only the cheap key string is hashed while the
+    original objects are used as-is (no JSON round-trip of the data).
+
+    Args:
+        cache_key: Stable serialized form of (config, data) used as cache key
+        _config: Dictionary with chart configuration (type, title, axes, etc)
+        _data: Columnar {column: [values]} dict or list of row dictionaries
+
+    Returns:
+        A Plotly figure, or None if no chart could be built
+    """
+    config = _config
+    df = pd.DataFrame(_data)
+
+    chart_type = config.get("chart_type", "").lower()
+    title = config.get("title", "Data Visualization")
+
+    logger.info(f"Rendering {chart_type} chart: '{title}'")
+
+    x_field = config.get("x_field") or config.get("x_axis", {}).get("data_key")
+    y_field = config.get("y_field") or config.get("y_axis", {}).get("data_key")
+    color_by = config.get("color_by")
+
+    logger.debug(f"Chart parameters - x: {x_field}, y: {y_field}, color: {color_by}")
+
+    fig = None
+
+    if chart_type == "bar" and x_field and y_field and x_field in df.columns and y_field in df.columns:
+        fig = px.bar(
+            df,
+            x=x_field,
+            y=y_field,
+            color=color_by if color_by and color_by in df.columns else None,
+            title=title
+        )
+
+    elif chart_type == "line" and x_field and y_field and x_field in df.columns and y_field in df.columns:
+        fig = px.line(
+            df,
+            x=x_field,
+            y=y_field,
+            color=color_by if color_by and color_by in df.columns else None,
+            title=title
+        )
+
+    elif chart_type == "pie":
+        values = config.get("values") or y_field
+        names = config.get("names") or x_field
+
+        if values and names and values in df.columns and names in df.columns:
+            fig = px.pie(
+                df,
+                values=values,
+                names=names,
+                title=title
+            )
+
+    elif chart_type == "scatter" and x_field and y_field and x_field in df.columns and y_field in df.columns:
+        fig = px.scatter(
+            df,
+            x=x_field,
+            y=y_field,
+            color=color_by if color_by and color_by in df.columns else None,
+            title=title
+        )
+
+    elif chart_type == "heatmap" and x_field and y_field and x_field in df.columns and y_field in df.columns:
+        # Build the matrix directly with NumPy instead of going through
+        # pandas' pivot/crosstab reshape machinery: unique() yields the axis
+        # labels plus each row's cell index, and add.at accumulates values
+        # (or counts, when no value column exists) in place.
+        y_labels, y_idx = np.unique(df[y_field].to_numpy(), return_inverse=True)
+        x_labels, x_idx = np.unique(df[x_field].to_numpy(), return_inverse=True)
+        matrix = np.zeros((len(y_labels), len(x_labels)), dtype=np.float64)
+        if "value" in df.columns:
+            np.add.at(matrix, (y_idx, x_idx), df["value"].to_numpy(dtype=np.float64))
+        else:
+            np.add.at(matrix, (y_idx, x_idx), 1.0)
+        fig = px.imshow(matrix, x=x_labels, y=y_labels, title=title)
+
+    elif chart_type == "table" or not chart_type:
+        table_columns = config.get("columns", [])
+        if table_columns:
+            headers, data_keys = _table_schema(
+                tuple((col.get("header", ""), col.get("data_key", "")) for col in table_columns)
+            )
+
+            filtered_columns = [key for key in data_keys if key in df.columns]
+            filtered_df = df[filtered_columns] if filtered_columns else df
+
+            header_mapping = dict(zip(filtered_columns, headers[:len(filtered_columns)]))
+            filtered_df = filtered_df.rename(columns=header_mapping)
+        else:
+            filtered_df = df
+
+        fig = go.Figure(
+            data=[
+                go.Table(
+                    header=dict(
+                        values=list(filtered_df.columns),
+                        fill_color="paleturquoise",
+                        align="left",
+                        line_color='darkslategray',
+                    ),
+                    cells=dict(
+                        # ndarrays serialize without per-column pandas Index
+                        # metadata, which Plotly would otherwise encode too.
+                        values=[filtered_df[col].to_numpy() for col in filtered_df.columns],
+                        fill_color="lavender",
+                        align="left",
+                        line_color='darkslategray',
+                    ),
+                )
+            ]
+        )
+        fig.update_layout(title=title)
+
+    return fig
+
+
 def render_visualization(config, data):
     """
     Render visualization based on configuration and data using Plotly.
-    
+
     Args:
         config: Dictionary with chart configuration (type, title, axes, etc)
-        data: List of dictionaries with the data to visualize
+        data: Columnar {column: [values]} dict or list of row dictionaries
     """
     if not config or not data or len(data) == 0:
         logger.warning("No data available for visualization")
         st.info("No data available for visualization")
         return
-    
+
     try:
-        df = pd.DataFrame(data)
-        
         chart_type = config.get("chart_type", "").lower()
         title = config.get("title", "Data Visualization")
-        
-        logger.info(f"Rendering {chart_type} chart: '{title}'")
-        
+
         st.subheader(title)
-        
-        x_field = config.get("x_field") or config.get("x_axis", {}).get("data_key")
-        y_field = config.get("y_field") or config.get("y_axis", {}).get("data_key")
-        color_by = config.get("color_by")
-        
-        logger.debug(f"Chart parameters - x: {x_field}, y: {y_field}, color: {color_by}")
-        
-        fig = None
-        
-        if chart_type == "bar" and x_field and y_field and x_field in df.columns and y_field in df.columns:
-            fig = px.bar(
-                df,
-                x=x_field,
-                y=y_field,
-                color=color_by if color_by and color_by in df.columns else None,
-                title=title
-            )
-            
-        elif chart_type == "line" and x_field and y_field and x_field in df.columns and y_field in df.columns:
-            fig = px.line(
-                df,
-                x=x_field,
-                y=y_field,
-                color=color_by if color_by and color_by in df.columns else None,
-                title=title
-            )
-            
-        elif chart_type == "pie":
-            values = config.get("values") or y_field
-            names = config.get("names") or x_field
-            
-            if values and names and values in df.columns and names in df.columns:
-                fig = px.pie(
-                    df,
-                    values=values,
-                    names=names,
-                    title=title
-                )
-            
-        elif chart_type == "scatter" and x_field and y_field and x_field in df.columns and y_field in df.columns:
-            fig = px.scatter(
-                df,
-                x=x_field,
-                y=y_field,
-                color=color_by if color_by and color_by in df.columns else None,
-                title=title
-            )
-            
-        elif chart_type == "heatmap" and x_field and y_field and x_field in df.columns and y_field in df.columns:
-            if "value" in df.columns:
-                pivot_df = df.pivot(index=y_field, columns=x_field, values="value")
-                fig = px.imshow(pivot_df, title=title)
-            else:
-                cross_tab = pd.crosstab(df[y_field], df[x_field])
-                fig = px.imshow(cross_tab, title=title)
-                
-        elif chart_type == "table" or not chart_type:
-            table_columns = config.get("columns", [])
-            if table_columns:
-                headers = [col.get("header", col.get("data_key", "")) for col in table_columns]
-                data_keys = [col.get("data_key", "") for col in table_columns]
-                
-                filtered_columns = [key for key in data_keys if key in df.columns]
-                filtered_df = df[filtered_columns] if filtered_columns else df
-                
-                header_mapping = dict(zip(filtered_columns, headers[:len(filtered_columns)]))
-                filtered_df = filtered_df.rename(columns=header_mapping)
-            else:
-                filtered_df = df
-                
-            fig = go.Figure(
-                data=[
-                    go.Table(
-                        header=dict(
-                            values=list(filtered_df.columns),
-                            fill_color="paleturquoise",
-                            align="left",
-                            line_color='darkslategray',
-                        ),
-                        cells=dict(
-                            values=[filtered_df[col] for col in filtered_df.columns],
-                            fill_color="lavender",
-                            align="left",
-                            line_color='darkslategray',
-                        ),
-                    )
-                ]
-            )
-            fig.update_layout(title=title)
-        
+
+        # The config carries the row data under "data"; keep it out of the
+        # key so the payload is not serialized twice.
+        cache_key = json.dumps(
+            ({k: v for k, v in config.items() if k != "data"}, data),
+            sort_keys=True,
+            default=str,
+        )
+        fig = _build_figure(cache_key, config, data)
+
         if fig:
             st.plotly_chart(fig, use_container_width=True)
             logger.info(f"Successfully rendered {chart_type} visualization")
         else:
             logger.warning(f"Failed to create {chart_type} chart with the provided data")
             st.error(f"Failed to create {chart_type} chart with the provided data.")
-            st.dataframe(df, use_container_width=True)
-                
+            st.dataframe(pd.DataFrame(data), use_container_width=True)
+
     except Exception as e:
         logger.error(f"Error generating visualization: {str(e)}")
         st.error(f"Error generating visualization: {str(e)}")
         try:
-            st.dataframe(df, use_container_width=True)
-        except:
-            st.error("Unable to display data table")
\ No newline at end of file
+            st.dataframe(pd.DataFrame(data), use_container_width=True)
+        except Exception:
+            st.error("Unable to display data table")
@@ -2,15 +2,48 @@
 Event handlers for the Google Analytics - Business Intelligence - Agent web interface.
 """
 import asyncio
+import re
 import streamlit as st
 import logging
-from datetime import datetime
+import time
+from dataclasses import asdict
+from itertools import islice
 from src.core.graph import stream_analytics_query, StreamEvent
 from src.web.state import reset_current_response
-from src.web.components.chat import create_chat_message_placeholders
+from src.web.components.chat import create_chat_message_placeholders, render_response, viz_table
+from src.web.components.visualization import render_visualization
 
 logger = logging.getLogger("gabi.web.handlers")
 
+# Case-insensitive scan for the router's exit tag; avoids lowercasing a
+# copy of the whole LLM response just to locate it.
+_ROUTER_TAG_RE = re.compile(r"analytics_query:\s*false", re.IGNORECASE)
+
+# How many past turns are forwarded to the graph as conversation context.
+HISTORY_WINDOW = 16
+
+def _get_event_loop():
+    """
+    Return this session's event loop used to drive query processing.
+
+    asyncio.run would build and tear down a fresh loop (selector, default
+    executor, async generator hooks) on every user turn; reusing one loop
+    keeps that bootstrap off the per-query path and lets warm client
+    connections created inside the graph survive between queries. The
+    loop lives in session state rather than a process-wide cache because
+    run_until_complete is not reentrant — concurrent sessions sharing one
+    loop would collide.
+
+    Returns:
+        A reusable asyncio event loop
+    """
+    loop = st.session_state.get("_event_loop")
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        st.session_state._event_loop = loop
+    return loop
+
+
 def handle_new_query(query):
     """
     Handle a new query from the user.
@@ -19,14 +52,65 @@ def handle_new_query(query):
         query: The user's natural language question
     """
     if query and not st.session_state.is_processing:
-        logger.info(f"New query received: '{query}'")
-        
+        logger.info("New query received: '%.100s'", query)
+
         with st.chat_message("user"):
             st.markdown(query)
-        
+
+        # Each submission gets its own id: gating on query text would make
+        # re-asking the same question (e.g. clicking an example twice) look
+        # already-streamed and skip processing entirely.
+        st.session_state.query_seq = st.session_state.get("query_seq", 0) + 1
+        _assistant_response_fragment(query, st.session_state.query_seq)
+
+
+@st.fragment
+def _assistant_response_fragment(query: str, submission_id: int):
+    """
+    Render the assistant response inside a Streamlit fragment.
+
+    Scoping the streaming updates to a fragment means the rerun issued when
+    processing finishes re-executes only this subtree instead of the whole
+    page, so the chat history above is not redrawn per query. The first
+    execution streams the answer into placeholders; the fragment rerun then
+    redraws the completed response from session state.
+
+    Args:
+        query: The user's natural language question
+        submission_id: Monotonic id distinguishing repeat submissions of
+            the same text
+    """
+    if st.session_state.get("streamed_query") != submission_id:
+        st.session_state.streamed_query = submission_id
         create_chat_message_placeholders()
-        
-        asyncio.run(process_query_async(query))
+        _get_event_loop().run_until_complete(process_query_async(query))
+    else:
+        with st.chat_message("assistant"):
+            render_response(asdict(st.session_state.current_response))
+
+
+def _to_columnar(rows):
+    """
+    Pivot list-of-dict rows into a column-major {column: [values]} dict.
+
+    pd.DataFrame over a columnar dict wraps the value lists directly instead
+    of scanning every row dict for columns and dtypes; the columnar form is
+    what gets stored in chat history, so every later rerender reuses it.
+
+    Args:
+        rows: List of row dictionaries (or an already-columnar payload)
+
+    Returns:
+        A columnar dict, or the input unchanged when it is not a row list
+    """
+    if not rows or not isinstance(rows, list) or not isinstance(rows[0], dict):
+        return rows
+    return {key: [row.get(key) for row in rows] for key in rows[0]}
+
+
+def _content_of(message):
+    """Return a message's text whether it is a LangChain message or a str."""
+    return message.content if hasattr(message, "content") else str(message)
 
 
 def handle_stream_event(event: StreamEvent):
@@ -38,147 +122,202 @@ def handle_stream_event(event: StreamEvent):
     """
     data = event.get("data", {})
     node = event.get("node")
-    
-    logger.debug(f"Stream event from {node} node")
-    
-    if node == "conversation_router":
-        router_data = data.get("conversation_router", {})
-        requires_analytics = router_data.get("requires_analytics", False)
-        
-        if not requires_analytics:
-            general_response = router_data.get("general_response", "")
-            
-            if not general_response and "messages" in router_data:
-                messages = router_data["messages"]
-                if messages and hasattr(messages[-1], "content"):
-                    content = messages[-1].content
-                    tag_index = content.lower().find("analytics_query: false")
-                    if tag_index > 0:
-                        general_response = content[:tag_index].strip()
-                    else:
-                        general_response = content
-            
-            if not general_response and messages and isinstance(messages[-1], str):
-                general_response = messages[-1]
-                
-            logger.info("General response extracted")
-            
-            if general_response:
-                st.session_state.current_response["explanation"] = general_response
-                
-                if st.session_state.response_placeholder:
-                    with st.session_state.response_placeholder:
-                        st.markdown(general_response)
-                
-                if st.session_state.sql_placeholder:
-                    with st.session_state.sql_placeholder:
-                        st.empty()
-                        
-                if st.session_state.table_placeholder:
-                    with st.session_state.table_placeholder:
-                        st.empty()
-                        
-                if st.session_state.viz_placeholder:
-                    with st.session_state.viz_placeholder:
-                        st.empty()
-                        
-                if st.session_state.explanation_placeholder:
-                    with st.session_state.explanation_placeholder:
-                        st.empty()
+
+    logger.debug("Stream event from %s node", node)
+
+    if event.get("type") == "token":
+        # Only the explainer's prose is rendered incrementally; other nodes'
+        # raw LLM output (SQL, control tags, viz JSON) stays off-screen.
+        if node != "results_explainer":
+            return
+
+        # One proxy traversal instead of two; this branch runs per token
+        # batch, the hottest path in the file.
+        cr = st.session_state.current_response
+        explanation = (cr.explanation or "") + (data or "")
+        cr.explanation = explanation
+
+        if st.session_state.explanation_placeholder:
+            with st.session_state.explanation_placeholder:
+                st.markdown("### Analysis")
+                st.markdown(explanation)
+        return
+
+    # Repeated updates with an unchanged payload are common on successive
+    # graph ticks; skip the placeholder rewrite (and its front-end round
+    # trip) when nothing about this node's delta changed. Token events stay
+    # above this check since their payloads accumulate.
+    event_key = (node, repr(data.get(node, {})))
+    if st.session_state.get("_last_stream_key") == event_key:
+        return
+    st.session_state._last_stream_key = event_key
+
+    handler = _NODE_HANDLERS.get(node)
+    if handler:
+        handler(data.get(node, {}))
+
+
+def _on_conversation_router(router_data):
+    """Render the router's decision: a direct answer or a progress note."""
+    requires_analytics = router_data.get("requires_analytics", False)
+
+    if not requires_analytics:
+        general_response = router_data.get("general_response", "")
+        messages = router_data.get("messages", [])
+
+        if not general_response and messages:
+            content = _content_of(messages[-1])
+            tag_match = _ROUTER_TAG_RE.search(content)
+            if tag_match and tag_match.start() > 0:
+                general_response = content[:tag_match.start()].strip()
             else:
-                logger.warning("No general response extracted from router data")
-                if st.session_state.response_placeholder:
-                    with st.session_state.response_placeholder:
-                        st.markdown("I'm not sure how to respond to that.")
-        
-        elif requires_analytics and st.session_state.response_placeholder:
-            with st.session_state.response_placeholder:
-                st.markdown("Processing your analytics query...")
-    
-    elif node == "sql_generator":
-        if data.get("sql_generator", {}).get("sql_query"):
-            sql_query = data["sql_generator"]["sql_query"]
-            st.session_state.current_response["sql_query"] = sql_query
-            
-            logger.info("SQL query generated")
-            
-            if st.session_state.sql_placeholder:
-                with st.session_state.sql_placeholder:
-                    with st.expander("SQL Query", expanded=True):
-                        st.markdown(sql_query)
-            
-            if st.session_state.response_placeholder:
-                with st.session_state.response_placeholder:
-                    st.markdown("Generating SQL query...")
-    
-    elif node == "sql_executor":
-        if "query_results" in data.get("sql_executor", {}):
-            logger.info("Running SQL query on BigQuery")
+                general_response = content
+
+        logger.info("General response extracted")
+
+        if general_response:
+            st.session_state.current_response.explanation = general_response
+
             if st.session_state.response_placeholder:
                 with st.session_state.response_placeholder:
-                    st.markdown("Running SQL query on BigQuery...")
-    
-    elif node == "sql_reflection":
-        reflection_data = data.get("sql_reflection", {})
-        if reflection_data:
-            reflection_result = reflection_data.get("reflection_result")
-            sql_feedback = reflection_data.get("sql_feedback")
-            
-            st.session_state.current_response["reflection_result"] = reflection_result
-            if sql_feedback:
-                st.session_state.current_response["sql_feedback"] = sql_feedback
-            
-            logger.info(f"SQL Reflection decision: {reflection_result}")
-            
+                    st.markdown(general_response)
+
+            # Clear with the placeholder's own .empty() method; the old
+            # `with placeholder: st.empty()` form nested a brand-new empty
+            # element inside each one, costing an extra front-end message
+            # per placeholder just to blank containers that the router —
+            # running before any other node — has never seen written to.
+            for name in ("sql_placeholder", "table_placeholder",
+                         "viz_placeholder", "explanation_placeholder"):
+                placeholder = st.session_state.get(name)
+                if placeholder:
+                    placeholder.empty()
+        else:
+            logger.warning("No general response extracted from router data")
             if st.session_state.response_placeholder:
                 with st.session_state.response_placeholder:
-                    if reflection_result == "PASS":
-                        st.markdown("SQL results look good, generating visualization...")
-                    elif reflection_result == "RETRY":
-                        feedback_summary = sql_feedback[:100] + "..." if sql_feedback and len(sql_feedback) > 100 else "No specific feedback provided"
-                        st.markdown(f"Refining SQL query to get better results: {feedback_summary}")
-    
-    elif node == "visualization_generator":
-        viz_config = data.get("visualization_generator", {}).get("visualization_config")
-        if viz_config:
-            st.session_state.current_response["viz_config"] = viz_config
-            st.session_state.current_response["viz_data"] = viz_config.get("data", [])
-            
-            chart_type = viz_config.get("chart_type", "unknown")
-            data_count = len(viz_config.get("data", []))
-            logger.info(f"Visualization created: {chart_type} with {data_count} rows")
-            
-            if st.session_state.viz_placeholder and st.session_state.table_placeholder:
-                with st.session_state.table_placeholder:
-                    with st.expander("Data Table", expanded=False):
-                        try:
-                            import pandas as pd
-                            df = pd.DataFrame(viz_config.get("data", []))
-                            st.dataframe(df, use_container_width=True)
-                        except Exception as e:
-                            logger.error(f"Error displaying data table: {str(e)}")
-                            st.error(f"Error displaying data: {str(e)}")
-                
-                from src.web.components.visualization import render_visualization
-                with st.session_state.viz_placeholder:
-                    render_visualization(
-                        viz_config, 
-                        viz_config.get("data", [])
-                    )
-    
-    elif node == "results_explainer":
-        messages = data.get("results_explainer", {}).get("messages", [])
-        if messages and len(messages) > 0:
-            content = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
-            
-            st.session_state.current_response["explanation"] = content
-            
-            logger.info("Explanation generated")
-            
-            if st.session_state.explanation_placeholder:
-                with st.session_state.explanation_placeholder:
-                    st.markdown("### Analysis")
-                    st.markdown(content)
+                    st.markdown("I'm not sure how to respond to that.")
+
+    elif requires_analytics and st.session_state.response_placeholder:
+        with st.session_state.response_placeholder:
+            st.markdown("Processing your analytics query...")
+
+
+def _on_sql_generator(generator_data):
+    """Show the generated SQL in its expander."""
+    sql_query = generator_data.get("sql_query")
+    # Skip the rewrite when the SQL itself is unchanged, even if the rest
+    # of the node's payload differs (which defeats the event-level dedupe).
+    if sql_query and sql_query != st.session_state.current_response.sql_query:
+        st.session_state.current_response.sql_query = sql_query
+
+        logger.info("SQL query generated")
+
+        if st.session_state.sql_placeholder:
+            with st.session_state.sql_placeholder:
+                with st.expander("SQL Query", expanded=True):
+                    st.markdown(sql_query)
+
+        if st.session_state.response_placeholder:
+            with st.session_state.response_placeholder:
+                st.markdown("Generating SQL query...")
+
+
+def _on_sql_executor(executor_data):
+    """Acknowledge that the query is running against BigQuery."""
+    if "query_results" in executor_data:
+        logger.info("Running SQL query on BigQuery")
+        if st.session_state.response_placeholder:
+            with st.session_state.response_placeholder:
+                st.markdown("Running SQL query on BigQuery...")
+
+
+def _on_sql_reflection(reflection_data):
+    """Surface the reflection verdict and any retry feedback."""
+    if not reflection_data:
+        return
+
+    reflection_result = reflection_data.get("reflection_result")
+    sql_feedback = reflection_data.get("sql_feedback")
+
+    cr = st.session_state.current_response
+    if reflection_result == cr.reflection_result and sql_feedback == cr.sql_feedback:
+        return
+    cr.reflection_result = reflection_result
+    if sql_feedback:
+        cr.sql_feedback = sql_feedback
+
+    logger.info("SQL Reflection decision: %s", reflection_result)
+
+    if st.session_state.response_placeholder:
+        with st.session_state.response_placeholder:
+            if reflection_result == "PASS":
+                st.markdown("SQL results look good, generating visualization...")
+            elif reflection_result == "RETRY":
+                feedback_summary = sql_feedback[:100] + "..." if sql_feedback and len(sql_feedback) > 100 else "No specific feedback provided"
+                st.markdown(f"Refining SQL query to get better results: {feedback_summary}")
+
+
+def _on_visualization_generator(viz_node_data):
+    """Store the viz config columnar and draw the data table and chart."""
+    viz_config = viz_node_data.get("visualization_config")
+    if not viz_config:
+        return
+
+    rows = viz_config.get("data", [])
+    viz_data = _to_columnar(rows)
+    # Keep the rows only once: viz_data holds the columnar form every
+    # renderer consumes, so the original row list inside the config would
+    # just sit in chat history doubling the payload's footprint.
+    viz_config = {k: v for k, v in viz_config.items() if k != "data"}
+    cr = st.session_state.current_response
+    cr.viz_config = viz_config
+    cr.viz_data = viz_data
+
+    chart_type = viz_config.get("chart_type", "unknown")
+    logger.info("Visualization created: %s with %d rows", chart_type, len(rows))
+
+    if st.session_state.viz_placeholder and st.session_state.table_placeholder:
+        with st.session_state.table_placeholder:
+            with st.expander("Data Table", expanded=False):
+                try:
+                    st.dataframe(viz_table(viz_data), use_container_width=True)
+                except Exception as e:
+                    logger.error("Error displaying data table: %s", e)
+                    st.error(f"Error displaying data: {str(e)}")
+
+        with st.session_state.viz_placeholder:
+            render_visualization(viz_config, viz_data)
+
+
+def _on_results_explainer(explainer_data):
+    """Render the final explanation text."""
+    content = explainer_data.get("explanation")
+    if not content:
+        messages = explainer_data.get("messages", [])
+        if messages:
+            content = _content_of(messages[-1])
+
+    if content and content != st.session_state.current_response.explanation:
+        st.session_state.current_response.explanation = content
+
+        logger.info("Explanation generated")
+
+        if st.session_state.explanation_placeholder:
+            with st.session_state.explanation_placeholder:
+                st.markdown("### Analysis")
+                st.markdown(content)
+
+
+# O(1) dispatch instead of an elif ladder of string compares per event.
+_NODE_HANDLERS = {
+    "conversation_router": _on_conversation_router,
+    "sql_generator": _on_sql_generator,
+    "sql_executor": _on_sql_executor,
+    "sql_reflection": _on_sql_reflection,
+    "visualization_generator": _on_visualization_generator,
+    "results_explainer": _on_results_explainer,
+}
 
 
 async def process_query_async(question: str):
@@ -188,38 +327,91 @@ async def process_query_async(question: str):
     Args:
         question: The user's natural language question
     """
-    query_start_time = datetime.now()
-    logger.info(f"Processing query: '{question[:50]}...' if len(question) > 50 else question")
+    # Monotonic clock: immune to NTP adjustments mid-query, no datetime
+    # object construction.
+    query_start_time = time.perf_counter()
+    logger.info("Processing query: '%.50s'", question)
     
     reset_current_response()
-    
+
+    # Dedupe only within one query: an identical payload from the next
+    # query (e.g. the same synthetic greeting event) must still render.
+    st.session_state._last_stream_key = None
+
     st.session_state.is_processing = True
     
-    chat_history = []
-    if st.session_state.chat_history:
-        chat_history = st.session_state.chat_history.copy()
+    # Only the most recent turns go to the backend: older ones add prompt
+    # tokens (and normalization work) without improving follow-up answers.
+    # The backend treats the list read-only; islice because the history is
+    # a deque, which does not support slicing.
+    history = st.session_state.chat_history
+    chat_history = list(islice(history, max(len(history) - HISTORY_WINDOW, 0), None))
     
     try:
         event_count = 0
-        async for event in stream_analytics_query(question, handle_stream_event, chat_history=chat_history):
-            event_count += 1
-        
-        logger.info(f"Query processing completed with {event_count} events")
+        event_queue: asyncio.Queue = asyncio.Queue()
+        stream_done = asyncio.Event()
+
+        async def _produce():
+            nonlocal event_count
+            try:
+                async for event in stream_analytics_query(question, chat_history=chat_history):
+                    event_count += 1
+                    await event_queue.put(event)
+            finally:
+                # Always signalled, even when the stream raises: the
+                # flusher's loop waits on this, and with the session-held
+                # event loop an unsignalled flusher would survive as a
+                # permanently polling orphan task.
+                stream_done.set()
+
+        async def _flush():
+            # Coalesce bursty stream events: drain everything queued every
+            # 50ms, keep one event per (type, node) — concatenating token
+            # payloads since the handler appends them — and render each node
+            # once per cycle instead of once per token.
+            while not (stream_done.is_set() and event_queue.empty()):
+                await asyncio.sleep(0.05)
+                latest = {}
+                while not event_queue.empty():
+                    event = event_queue.get_nowait()
+                    key = (event.get("type"), event.get("node"))
+                    previous = latest.get(key)
+                    if previous is not None and event.get("type") == "token":
+                        event = {**event, "data": previous["data"] + event["data"]}
+                    latest[key] = event
+                for event in latest.values():
+                    handle_stream_event(event)
+
+        await asyncio.gather(_produce(), _flush())
+
+        logger.info("Query processing completed with %d events", event_count)
     
     except Exception as e:
-        logger.error(f"Query processing failed: {str(e)}")
+        logger.error("Query processing failed: %s", e)
         if st.session_state.response_placeholder:
             with st.session_state.response_placeholder:
                 st.error(f"An error occurred while processing your query: {str(e)}")
     
+    # Snapshot to a plain dict once, at append time: the render helpers
+    # consume dict-shaped responses, and the next query rebinds
+    # current_response rather than mutating this one.
+    response_record = asdict(st.session_state.current_response)
+    if response_record["explanation"]:
+        # Pre-join the heading here so every later rerun of this turn is
+        # one st.markdown call instead of a heading plus a body.
+        response_record["explanation_md"] = (
+            "### Analysis\n\n" + response_record["explanation"]
+        )
     st.session_state.chat_history.append({
         "question": question,
-        "response": st.session_state.current_response.copy()
+        "response": response_record
     })
     
     st.session_state.is_processing = False
     
-    processing_time = (datetime.now() - query_start_time).total_seconds()
-    logger.info(f"Query processed in {processing_time:.2f} seconds")
-    
-    st.rerun()
\ No newline at end of file
+    processing_time = time.perf_counter() - query_start_time
+    logger.info("Query processed in %.2f seconds", processing_time)
+
+    # Only the enclosing fragment reruns; history above stays untouched.
+    st.rerun(scope="fragment")
\ No newline at end of file
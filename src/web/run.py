@@ -2,8 +2,6 @@
 Launcher script for the Google Analytics - Business Intelligence - Agent Streamlit interface
 """
 import os
-import sys
-import subprocess
 import logging
 from src.utils.logging import configure_logging
 
@@ -26,27 +24,14 @@ def run_streamlit_app():
     else:
         env["PYTHONPATH"] = project_root
     
-    # Run streamlit with stdout and stderr redirected to the terminal
-    process = subprocess.Popen(
+    # Replace this process with Streamlit instead of keeping a second
+    # interpreter alive just to wait on the child: no launcher RSS held
+    # for the app's lifetime, and Ctrl-C goes straight to Streamlit.
+    os.execvpe(
+        "streamlit",
         ["streamlit", "run", app_path, "--logger.level=info"],
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
+        env,
     )
-    
-    logger.info("Streamlit process started. Forwarding logs to console...")
-    
-    # Forward the output to the terminal
-    try:
-        for line in process.stdout:
-            print(line, end='')
-    except KeyboardInterrupt:
-        logger.info("Stopping Streamlit process...")
-        process.terminate()
-        process.wait()
-    
-    return process.returncode
 
 if __name__ == "__main__":
     run_streamlit_app()
\ No newline at end of file
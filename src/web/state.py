@@ -3,51 +3,68 @@ Session state management for the Google Analytics - Business Intelligence - Agen
 """
 import streamlit as st
 import logging
-from uuid import uuid4
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, Dict, Optional
 
-logger = st.logger.get_logger(__name__)
+logger = logging.getLogger("gabi.web.state")
+
+# Response ids only correlate log lines and history entries within this
+# process; a monotonic counter does that without uuid4's urandom read and
+# hex formatting on every query reset.
+_response_ids = count(1)
+
+# Chat history cap: session state lives in the server process for the whole
+# session, so an unbounded list of responses (each carrying result data)
+# would grow without limit. The deque silently drops the oldest turn once
+# full.
+MAX_CHAT_TURNS = 100
+
+
+@dataclass(slots=True)
+class CurrentResponse:
+    """
+    The in-flight assistant response, filled in field by field as stream
+    events arrive. A slotted dataclass rather than a dict: the hot event
+    handlers touch these fields many times per query, and attribute access
+    on slots skips the per-access string hashing a dict lookup pays.
+    Converted to a plain dict (dataclasses.asdict) when appended to chat
+    history, so stored responses keep the shape the render helpers expect.
+    """
+    id: str = field(default_factory=lambda: f"r{next(_response_ids)}")
+    sql_query: Optional[str] = None
+    viz_config: Optional[Dict[str, Any]] = None
+    viz_data: Optional[Any] = None
+    explanation: Optional[str] = None
+    reflection_result: Optional[str] = None
+    sql_feedback: Optional[str] = None
 
 def initialize_session_state():
     """Initialize all required session state variables"""
-    
+
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = deque(maxlen=MAX_CHAT_TURNS)
         logger.info("Initialized empty chat history")
 
-    if "is_processing" not in st.session_state:
-        st.session_state.is_processing = False
-
     if "current_response" not in st.session_state:
         reset_current_response()
-    
-    if "query" not in st.session_state:
-        st.session_state.query = ""
-
-    if "response_placeholder" not in st.session_state:
-        st.session_state.response_placeholder = None
-
-    if "sql_placeholder" not in st.session_state:
-        st.session_state.sql_placeholder = None
-
-    if "viz_placeholder" not in st.session_state:
-        st.session_state.viz_placeholder = None
-
-    if "table_placeholder" not in st.session_state:
-        st.session_state.table_placeholder = None
 
-    if "explanation_placeholder" not in st.session_state:
-        st.session_state.explanation_placeholder = None
+    # The remaining keys take shared immutable defaults; setdefault does
+    # the membership test and assignment in one session-state access each.
+    for key, value in (
+        ("is_processing", False),
+        ("query", ""),
+        ("response_placeholder", None),
+        ("sql_placeholder", None),
+        ("viz_placeholder", None),
+        ("table_placeholder", None),
+        ("explanation_placeholder", None),
+    ):
+        st.session_state.setdefault(key, value)
 
 
 def reset_current_response():
     """Reset the current response data"""
-    st.session_state.current_response = {
-        "id": str(uuid4()),
-        "sql_query": None,
-        "viz_config": None, 
-        "viz_data": None,
-        "explanation": None,
-        "reflection_result": None,
-        "sql_feedback": None
-    }
+    st.session_state.current_response = CurrentResponse()
     logger.debug("Reset current response data")
\ No newline at end of file